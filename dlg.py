@@ -3,17 +3,22 @@ DLG - Data, Logging, GCS utilities for scrapers.
 
 Provides:
 - save_to_gcs(): Upload local file to GCS with auto-naming
+- save_many_to_gcs(): Upload several local files to GCS in parallel
+- save_bytes_to_gcs(): Upload in-memory data to GCS (no temp file)
+- prune_old(): Delete old timestamped files from GCS, keeping the newest
 - send_slack_notification(): Send Slack alerts
+- batched_slack(): Collect Slack alerts and send them as one message
 
 Environment variables (auto-set by CI/CD):
 - PLATFORM_ID: Auto-extracted from repo name (scraper-kaki → kaki)
 - GCS_FOLDER: Same as PLATFORM_ID
 - GCS_BUCKET: Default "market-place-dev"
 - SLACK_WEBHOOK_URL: Set at GitLab Group level
+- SLACK_RATE_LIMIT_RETRIES: Retries on Slack 429/5xx (default 3)
 
 Usage:
 ------
-from dlg import save_to_gcs, send_slack_notification
+from dlg import save_to_gcs, save_many_to_gcs, save_bytes_to_gcs, prune_old, send_slack_notification, batched_slack
 
 # Save file to GCS (returns gcs_path)
 df.to_csv("/tmp/data.csv", index=False)
@@ -21,14 +26,39 @@ gcs_path = save_to_gcs("/tmp/data.csv")                       # → kaki/kaki_20
 gcs_path = save_to_gcs("/tmp/data.csv", prefix="raw")         # → kaki/raw_kaki_20260114_143052.csv
 gcs_path = save_to_gcs("/tmp/data.json", extension="json")    # → kaki/kaki_20260114_143052.json
 
+# Save raw + parsed files in one go (uploads run in parallel)
+raw_path, parsed_path = save_many_to_gcs([("/tmp/raw.csv", "raw"), ("/tmp/data.csv", None)])
+
+# Save bytes straight from memory
+gcs_path = save_bytes_to_gcs(df.to_csv(index=False).encode())  # → kaki/kaki_20260114_143052.csv
+
+# Keep only the 14 newest timestamped files (latest files are never deleted)
+prune_old()                                                   # → kaki/kaki_*.csv
+prune_old(prefix="raw", keep=7)                               # → kaki/raw_kaki_*.csv
+
 # Send Slack notification
 send_slack_notification("Scraper failed", status="error", details={"Error": str(e)})
+
+# Group alerts raised during a run into one Slack message
+with batched_slack():
+    run_scraper()
 """
 import os
+import gzip
+import shutil
+import tempfile
+import time
+import random
+import mimetypes
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
-from google.cloud import storage
+from typing import TYPE_CHECKING, Optional, Dict, Any, Iterator, List, Tuple, Union
+
+if TYPE_CHECKING:
+    from google.cloud import storage
 
 
 # === CONFIG (auto-set by CI/CD from repo name) ===
@@ -36,10 +66,206 @@ PLATFORM_ID = os.environ.get("PLATFORM_ID", "example")
 GCS_FOLDER = os.environ.get("GCS_FOLDER", "example")
 GCS_BUCKET = os.environ.get("GCS_BUCKET", "market-place-dev")
 
+# Max parallel uploads (the GCS client is thread-safe)
+GCS_UPLOAD_WORKERS = 4
+
+# Files above this size are uploaded in parallel chunks (XML multipart upload)
+GCS_CHUNKED_THRESHOLD = 50 * 1024 * 1024
+GCS_CHUNK_SIZE = 32 * 1024 * 1024
+GCS_CHUNK_WORKERS = 8
+
+# CSVs above this size are stored gzip-compressed (served decompressed by GCS)
+GCS_GZIP_THRESHOLD = 1024 * 1024
+GCS_GZIP_BUFFER_SIZE = 1024 * 1024
+
+# Created on first use, then reused for every upload in the process
+_STORAGE_CLIENT: Optional["storage.Client"] = None
+_BUCKETS: Dict[str, "storage.Bucket"] = {}
+
+# GCS JSON API accepts up to 100 calls per batch request
+GCS_BATCH_SIZE = 100
+
+# Negative values would skip posting entirely; treat them as 0 (one attempt)
+SLACK_RATE_LIMIT_RETRIES = max(0, int(os.environ.get("SLACK_RATE_LIMIT_RETRIES", "3")))
+# Longest Retry-After we honour before retrying
+SLACK_MAX_RETRY_AFTER = 30.0
+
+# Slack allows up to 20 attachments per message, ~1 message per second
+SLACK_MAX_ATTACHMENTS = 20
+SLACK_MESSAGE_INTERVAL = 1.0
+
+# (webhook_url, attachment) pairs queued while inside batched_slack()
+_PENDING_NOTIFICATIONS: List[Tuple[str, Dict[str, Any]]] = []
+_BATCH_DEPTH = 0
+_BATCH_LOCK = threading.Lock()
+
 
 # =============================================================================
 # GCS UPLOAD
 # =============================================================================
+def _client() -> "storage.Client":
+    """Shared GCS client (credential lookup and connection pool happen once)."""
+    # Imported here: google.cloud.storage is slow to import and only needed for uploads
+    from google.cloud import storage
+
+    global _STORAGE_CLIENT
+    _STORAGE_CLIENT = _STORAGE_CLIENT or storage.Client()
+    return _STORAGE_CLIENT
+
+
+def _bucket(name: str = GCS_BUCKET) -> "storage.Bucket":
+    """Shared bucket handle, cached by name."""
+    if name not in _BUCKETS:
+        _BUCKETS[name] = _client().bucket(name)
+    return _BUCKETS[name]
+
+
+def _blob_paths(
+    prefix: Optional[str],
+    extension: str,
+    date_str: str,
+    save_latest: bool
+) -> Tuple[str, Optional[str]]:
+    """Build (timestamped, latest) blob names; latest is None if not saved."""
+    # Build filename with optional prefix
+    if prefix:
+        filename = f"{prefix}_{PLATFORM_ID}_{date_str}.{extension}"
+        latest_filename = f"{prefix}_{PLATFORM_ID}_latest.{extension}"
+    else:
+        filename = f"{PLATFORM_ID}_{date_str}.{extension}"
+        latest_filename = f"{PLATFORM_ID}_latest.{extension}"
+
+    latest_path = f"{GCS_FOLDER}/{latest_filename}" if save_latest else None
+    return f"{GCS_FOLDER}/{filename}", latest_path
+
+
+def _upload_file(blob, file_path: str, content_type: Optional[str] = None) -> None:
+    """Upload a local file to blob, in parallel chunks if it is large."""
+    if os.path.getsize(file_path) <= GCS_CHUNKED_THRESHOLD:
+        blob.upload_from_filename(file_path, content_type=content_type)
+        return
+
+    from google.cloud.storage import transfer_manager
+
+    transfer_manager.upload_chunks_concurrently(
+        file_path,
+        blob,
+        content_type=content_type,
+        chunk_size=GCS_CHUNK_SIZE,
+        worker_type=transfer_manager.THREAD,
+        max_workers=GCS_CHUNK_WORKERS
+    )
+
+
+def _gzip_file(file_path: str) -> str:
+    """Stream-compress file_path into a temp .gz file and return its path."""
+    fd, gz_path = tempfile.mkstemp(suffix=".gz")
+    try:
+        with open(file_path, "rb") as src, os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as dst:
+                shutil.copyfileobj(src, dst, GCS_GZIP_BUFFER_SIZE)
+    except BaseException:
+        os.remove(gz_path)
+        raise
+    return gz_path
+
+
+def _upload(blob, source: Union[str, bytes]) -> None:
+    """Upload a local file path or in-memory bytes to blob."""
+    size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+    # Large CSVs compress well: send gzip bytes, GCS decompresses on download
+    if blob.name.endswith(".csv") and size > GCS_GZIP_THRESHOLD:
+        blob.content_encoding = "gzip"
+        if isinstance(source, bytes):
+            blob.upload_from_string(gzip.compress(source, compresslevel=1), content_type="text/csv")
+            return
+
+        # Files are compressed in a streaming pass, never loaded whole
+        gz_path = _gzip_file(source)
+        try:
+            _upload_file(blob, gz_path, content_type="text/csv")
+        finally:
+            os.remove(gz_path)
+        return
+
+    if isinstance(source, bytes):
+        content_type = mimetypes.guess_type(blob.name)[0]
+        blob.upload_from_string(source, content_type=content_type)
+        return
+
+    _upload_file(blob, source)
+
+
+def _upload_many(bucket, uploads: List[Tuple[Union[str, bytes], str, Optional[str]]]) -> None:
+    """
+    Upload (source, blob_name, latest_name) entries concurrently.
+
+    source is a local file path or bytes. The latest copy is made
+    server-side once the upload is done, so the bytes only go over the
+    wire once.
+    """
+    def upload(item):
+        source, blob_name, latest_name = item
+        print(f"Uploading to gs://{GCS_BUCKET}/{blob_name}")
+        blob = bucket.blob(blob_name)
+        _upload(blob, source)
+        print(f"Uploaded: gs://{GCS_BUCKET}/{blob_name}")
+
+        if latest_name:
+            bucket.copy_blob(blob, bucket, latest_name)
+            print(f"Copied to: gs://{GCS_BUCKET}/{latest_name}")
+
+    workers = min(GCS_UPLOAD_WORKERS, len(uploads))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() re-raises the first upload error, if any
+        list(pool.map(upload, uploads))
+
+
+def save_many_to_gcs(
+    files: List[Tuple[str, Optional[str]]],
+    extension: str = "csv",
+    save_latest: bool = True
+) -> List[str]:
+    """
+    Upload several local files to GCS in parallel, with auto-generated filenames.
+
+    Args:
+        files: List of (file_path, prefix) tuples, prefix as in save_to_gcs()
+        extension: File extension (default: "csv")
+        save_latest: Also save each file as {prefix_}latest.{ext} (default: True)
+
+    Returns:
+        list: GCS paths of the timestamped files, in the same order as files
+
+    Example:
+        save_many_to_gcs([("/tmp/raw.csv", "raw"), ("/tmp/data.csv", None)])
+            → [kaki/raw_kaki_20260114_143052.csv, kaki/kaki_20260114_143052.csv]
+    """
+    if not files:
+        return []
+
+    # Validate files exist
+    for file_path, _ in files:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        if not os.path.isfile(file_path):
+            raise ValueError(f"Not a file: {file_path}")
+
+    date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    uploads = []
+    gcs_paths = []
+    for file_path, prefix in files:
+        gcs_path, latest_path = _blob_paths(prefix, extension, date_str, save_latest)
+        uploads.append((file_path, gcs_path, latest_path))
+        gcs_paths.append(f"gs://{GCS_BUCKET}/{gcs_path}")
+
+    _upload_many(_bucket(), uploads)
+
+    return gcs_paths
+
+
 def save_to_gcs(
     file_path: str,
     prefix: Optional[str] = None,
@@ -63,49 +289,184 @@ def save_to_gcs(
         save_to_gcs("/tmp/data.csv", prefix="raw")          → kaki/raw_kaki_20260114_143052.csv
         save_to_gcs("/tmp/data.json", extension="json")     → kaki/kaki_20260114_143052.json
     """
-    import os
+    return save_many_to_gcs([(file_path, prefix)], extension, save_latest)[0]
 
-    # Validate file exists
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
-    if not os.path.isfile(file_path):
-        raise ValueError(f"Not a file: {file_path}")
 
-    date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+def save_bytes_to_gcs(
+    data: bytes,
+    prefix: Optional[str] = None,
+    extension: str = "csv",
+    save_latest: bool = True
+) -> str:
+    """
+    Upload in-memory data to GCS with auto-generated filename (no temp file).
 
-    # Build filename with optional prefix
-    if prefix:
-        filename = f"{prefix}_{PLATFORM_ID}_{date_str}.{extension}"
-        latest_filename = f"{prefix}_{PLATFORM_ID}_latest.{extension}"
-    else:
-        filename = f"{PLATFORM_ID}_{date_str}.{extension}"
-        latest_filename = f"{PLATFORM_ID}_latest.{extension}"
+    Args:
+        data: File contents to upload
+        prefix: Optional prefix for filename (e.g., "raw" → raw_kaki_20260114.csv)
+        extension: File extension, also used to set the content type (default: "csv")
+        save_latest: Also save as {prefix_}latest.{ext} (default: True)
+
+    Returns:
+        str: GCS path of timestamped file (gs://bucket/folder/file.ext)
+
+    Example:
+        save_bytes_to_gcs(df.to_csv(index=False).encode())  → kaki/kaki_20260114_143052.csv
+    """
+    date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+    gcs_path, latest_path = _blob_paths(prefix, extension, date_str, save_latest)
 
-    # GCS client
-    client = storage.Client()
-    bucket = client.bucket(GCS_BUCKET)
-
-    # Upload timestamped version
-    gcs_path = f"{GCS_FOLDER}/{filename}"
-    print(f"Uploading to gs://{GCS_BUCKET}/{gcs_path}")
-    blob = bucket.blob(gcs_path)
-    blob.upload_from_filename(file_path)
-    print(f"Uploaded: gs://{GCS_BUCKET}/{gcs_path}")
-
-    # Upload latest version
-    if save_latest:
-        latest_path = f"{GCS_FOLDER}/{latest_filename}"
-        print(f"Uploading to gs://{GCS_BUCKET}/{latest_path}")
-        blob_latest = bucket.blob(latest_path)
-        blob_latest.upload_from_filename(file_path)
-        print(f"Uploaded: gs://{GCS_BUCKET}/{latest_path}")
+    _upload_many(_bucket(), [(data, gcs_path, latest_path)])
 
     return f"gs://{GCS_BUCKET}/{gcs_path}"
 
 
+def prune_old(
+    prefix: Optional[str] = None,
+    extension: str = "csv",
+    keep: int = 14
+) -> int:
+    """
+    Delete old timestamped files from GCS, keeping the newest ones.
+
+    Only files named like save_to_gcs() output for this prefix/extension are
+    considered; {prefix_}latest files are never deleted. Deletes are grouped
+    into batch requests (one HTTP call per 100 files).
+
+    Args:
+        prefix: Same prefix passed to save_to_gcs() (e.g., "raw")
+        extension: File extension (default: "csv")
+        keep: Number of newest timestamped files to keep, >= 0 (default: 14)
+
+    Returns:
+        int: Number of files deleted
+
+    Example:
+        prune_old()                       → keeps newest 14 of kaki/kaki_*.csv
+        prune_old(prefix="raw", keep=7)   → keeps newest 7 of kaki/raw_kaki_*.csv
+    """
+    # blobs[keep:] with a negative keep would delete the oldest files instead
+    if keep < 0:
+        raise ValueError(f"keep must be >= 0, got {keep}")
+
+    name_prefix = f"{prefix}_{PLATFORM_ID}_" if prefix else f"{PLATFORM_ID}_"
+    client = _client()
+
+    blobs = [
+        blob for blob in client.list_blobs(GCS_BUCKET, prefix=f"{GCS_FOLDER}/{name_prefix}")
+        if blob.name.endswith(f".{extension}") and not blob.name.endswith(f"_latest.{extension}")
+    ]
+    blobs.sort(key=lambda blob: blob.time_created, reverse=True)
+    old = blobs[keep:]
+
+    for i in range(0, len(old), GCS_BATCH_SIZE):
+        with client.batch():
+            for blob in old[i:i + GCS_BATCH_SIZE]:
+                blob.delete()
+
+    for blob in old:
+        print(f"Deleted: gs://{GCS_BUCKET}/{blob.name}")
+
+    return len(old)
+
+
 # =============================================================================
 # SLACK NOTIFICATIONS
 # =============================================================================
+def _retry_after(response) -> float:
+    """Seconds to wait from a 429's Retry-After header, capped."""
+    try:
+        delay = float(response.headers.get("Retry-After", "1"))
+    except ValueError:
+        # e.g. an HTTP-date instead of seconds
+        delay = 1.0
+    return min(max(delay, 0.0), SLACK_MAX_RETRY_AFTER)
+
+
+def _post_to_slack(webhook_url: str, payload: Dict[str, Any]) -> None:
+    """
+    POST payload to the webhook, retrying rate limits and transient errors.
+
+    429 waits for the Retry-After header (capped), 5xx, connection errors
+    and timeouts back off exponentially. Raises the last error once
+    retries are exhausted.
+    """
+    for attempt in range(SLACK_RATE_LIMIT_RETRIES + 1):
+        retries_left = attempt < SLACK_RATE_LIMIT_RETRIES
+        backoff = 0.2 * 2 ** attempt + random.random() * 0.1
+
+        try:
+            response = requests.post(webhook_url, json=payload, timeout=10)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if not retries_left:
+                raise
+            time.sleep(backoff)
+            continue
+
+        if retries_left:
+            if response.status_code == 429:
+                delay = _retry_after(response)
+                print(f"Slack rate limited - retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            if response.status_code >= 500:
+                time.sleep(backoff)
+                continue
+
+        response.raise_for_status()
+        return
+
+
+def _flush_notifications() -> None:
+    """Send queued attachments, 20 per message, spaced 1s apart."""
+    with _BATCH_LOCK:
+        pending = list(_PENDING_NOTIFICATIONS)
+        _PENDING_NOTIFICATIONS.clear()
+
+    by_webhook: Dict[str, List[Dict[str, Any]]] = {}
+    for webhook_url, attachment in pending:
+        by_webhook.setdefault(webhook_url, []).append(attachment)
+
+    first = True
+    for webhook_url, attachments in by_webhook.items():
+        for i in range(0, len(attachments), SLACK_MAX_ATTACHMENTS):
+            chunk = attachments[i:i + SLACK_MAX_ATTACHMENTS]
+            # Stay under the webhook limit of 1 message per second
+            if not first:
+                time.sleep(SLACK_MESSAGE_INTERVAL)
+            first = False
+            try:
+                _post_to_slack(webhook_url, {"attachments": chunk})
+                print(f"Slack notification sent: {len(chunk)} batched")
+            except Exception as e:
+                print(f"Failed to send Slack notification: {e}")
+
+
+@contextmanager
+def batched_slack() -> Iterator[None]:
+    """
+    Queue send_slack_notification() calls and send them together on exit.
+
+    Keeps bursts of alerts (e.g. several failing pages) under Slack's
+    webhook rate limit. Nested blocks flush when the outermost one exits.
+
+    Example:
+        with batched_slack():
+            run_scraper()
+    """
+    global _BATCH_DEPTH
+    with _BATCH_LOCK:
+        _BATCH_DEPTH += 1
+    try:
+        yield
+    finally:
+        with _BATCH_LOCK:
+            _BATCH_DEPTH -= 1
+            outermost = _BATCH_DEPTH == 0
+        if outermost:
+            _flush_notifications()
+
+
 def send_slack_notification(
     message: str,
     status: str = "info",
@@ -122,7 +483,7 @@ def send_slack_notification(
         webhook_url: Slack webhook URL (defaults to SLACK_WEBHOOK_URL env var)
 
     Returns:
-        True if sent successfully, False otherwise
+        True if sent successfully (or queued inside batched_slack()), False otherwise
 
     Example:
         try:
@@ -174,11 +535,16 @@ def send_slack_notification(
                 "short": len(str(value)) < 30
             })
 
+    with _BATCH_LOCK:
+        if _BATCH_DEPTH:
+            _PENDING_NOTIFICATIONS.append((webhook_url, attachment))
+            print(f"Slack notification queued: {status}")
+            return True
+
     payload = {"attachments": [attachment]}
 
     try:
-        response = requests.post(webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
+        _post_to_slack(webhook_url, payload)
         print(f"Slack notification sent: {status}")
         return True
     except Exception as e:
@@ -5,25 +5,56 @@ Simple template for building scrapers with GCS upload.
 Replace the example scraping logic with your own.
 """
 import os
+import re
 import json
+import orjson
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from fake_useragent import UserAgent
-from dlg import send_slack_notification, save_to_gcs
+from dlg import send_slack_notification, batched_slack, save_bytes_to_gcs
 
 # === CONFIG (auto-set by CI/CD from repo name) ===
 PLATFORM_ID = os.environ.get("PLATFORM_ID", "example")
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "csv").strip().lower()  # "csv" or "parquet", checked in run_scraper
 
 # === SETUP ===
-ua = UserAgent(platforms='desktop')
+# Recent desktop browsers, rotated per request
+UA_POOL = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:133.0) Gecko/20100101 Firefox/133.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:133.0) Gecko/20100101 Firefox/133.0",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:133.0) Gecko/20100101 Firefox/133.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+)
 HEADERS = {
-    "user-agent": ua.random,
     "accept": "application/json",
 }
-print(f"Using User-Agent: {HEADERS['user-agent']}")
+
+# Shared session: keeps TCP/TLS connections alive across pages
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
+))
 
 
 def notify_error(error_type: str, detail: str, status_code: int):
@@ -39,6 +70,135 @@ def notify_error(error_type: str, detail: str, status_code: int):
     )
 
 
+def _timestamps_to_csv(column):
+    """Format timestamps the way pandas' to_csv does"""
+    tz = column.type.tz
+    # Coarsest unit that holds every value, so whole seconds print without fractions
+    for unit in ("s", "ms", "us", "ns"):
+        try:
+            column = column.cast(pa.timestamp(unit, tz))
+            break
+        except pa.ArrowInvalid:
+            continue
+
+    midnight = pc.and_(pc.equal(pc.hour(column), 0), pc.and_(
+        pc.equal(pc.minute(column), 0), pc.equal(pc.second(column), 0)))
+    if tz is None and unit == "s" and pc.all(midnight).as_py() is not False:
+        return pc.strftime(column, format="%Y-%m-%d")
+
+    if tz is None:
+        return pc.strftime(column, format="%Y-%m-%d %H:%M:%S")
+    text = pc.strftime(column, format="%Y-%m-%d %H:%M:%S%z")
+    return pc.replace_substring_regex(text, pattern=r"([+-]\d\d)(\d\d)$", replacement=r"\1:\2")
+
+
+def _csv_table(table):
+    """
+    Render every column as text, matching pandas' CSV formatting
+
+    Booleans as True/False, floats keep their decimal (1.0), timestamps
+    without padding zeros (2026-01-01 / 2026-01-01 12:30:00). Raises
+    TypeError for types it has no pandas-compatible format for.
+    """
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_boolean(column.type):
+            column = pc.if_else(column, "True", "False")
+        elif pa.types.is_floating(column.type):
+            column = pc.replace_substring_regex(
+                column.cast(pa.string()), pattern=r"^(-?\d+)$", replacement=r"\1.0")
+        elif pa.types.is_timestamp(column.type):
+            column = _timestamps_to_csv(column)
+        elif (pa.types.is_integer(column.type) or pa.types.is_string(column.type)
+              or pa.types.is_date(column.type) or pa.types.is_decimal(column.type)
+              or pa.types.is_null(column.type)):
+            column = column.cast(pa.string())
+        else:
+            raise TypeError(f"Can't write column {name!r} of type {column.type} to CSV")
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+# Characters that make pandas (csv.QUOTE_MINIMAL) quote a field
+_CSV_SPECIAL_RE = re.compile(r'[,"\r\n]')
+
+
+def _quote_csv(column):
+    """Quote text values only when they contain a comma, quote or newline"""
+    quoted = pc.binary_join_element_wise('"', pc.replace_substring(column, '"', '""'), '"', "")
+    return pc.if_else(pc.match_substring_regex(column, _CSV_SPECIAL_RE.pattern), quoted, column)
+
+
+def _csv_header(names) -> bytes:
+    """CSV header line, quoted like pandas"""
+    fields = [
+        '"' + name.replace('"', '""') + '"' if _CSV_SPECIAL_RE.search(name) else name
+        for name in map(str, names)
+    ]
+    return (",".join(fields) + "\n").encode()
+
+
+def _csv_rows(table) -> bytes:
+    """
+    CSV lines (no header) for an all-text table, assembled with Arrow compute
+
+    pyarrow's own CSV writer quotes every text value; this keeps pandas'
+    minimal quoting instead.
+    """
+    if table.num_rows == 0:
+        return b""
+
+    columns = [_quote_csv(column) for column in table.columns]
+    if len(columns) == 1:
+        # A lone empty field would read back as a blank line: pandas writes ""
+        columns = [pc.if_else(pc.equal(pc.fill_null(columns[0], ""), ""), '""', columns[0])]
+
+    rows = pc.binary_join_element_wise(*columns, ",", null_handling="replace", null_replacement="")
+    lines = pc.binary_join_element_wise(rows, "\n", "").combine_chunks().cast(pa.large_string())
+    body = pc.binary_join(pa.LargeListArray.from_arrays([0, len(lines)], lines), pa.scalar("", pa.large_string()))
+    return body[0].as_buffer().to_pybytes()
+
+
+def _to_json_text(value):
+    """Render a decoded JSON value as text: nested values as JSON, None stays null"""
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    return str(value)
+
+
+def to_csv_bytes(df) -> bytes:
+    """Serialize DataFrame to CSV bytes in memory, formatted like df.to_csv"""
+    import pandas as pd
+
+    def cell_text(value):
+        # pd.isna only answers yes/no for scalars (arrays etc. are rendered via str)
+        if pd.api.types.is_scalar(value) and pd.isna(value):
+            return None
+        return _to_json_text(value)
+
+    df = df.copy(deep=False)
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_timedelta64_dtype(column):
+            # pandas' own rendering (0 days 00:00:01), Arrow would give raw integers
+            df[name] = column.astype(str).where(column.notna(), None)
+        elif column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) not in ("string", "empty"):
+            # Object columns holding anything but text: nested values as JSON, the rest via str()
+            df[name] = column.map(cell_text)
+
+    table = _csv_table(pa.Table.from_pandas(df, preserve_index=False))
+    return _csv_header(table.column_names) + _csv_rows(table)
+
+
+def to_parquet_bytes(df) -> bytes:
+    """Serialize DataFrame to Snappy-compressed Parquet bytes in memory"""
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), sink, compression="snappy")
+    return sink.getvalue().to_pybytes()
+
+
 # =============================================================================
 # SCRAPING LOGIC (replace with your own)
 # =============================================================================
@@ -46,46 +206,208 @@ def fetch_page(url, page=1, delay_range=(0.2, 0.5)):
     """
     Example: Fetch a single page of results
     Replace with your actual API/scraping logic
+
+    Waits a random delay_range pause per request, counted from when the
+    request started: a slow response already spaced requests out.
     """
+    started = time.perf_counter()
     try:
-        response = requests.get(
+        response = SESSION.get(
             url,
-            headers=HEADERS,
+            headers={"user-agent": random.choice(UA_POOL)},
             params={"page": page},
             timeout=30
         )
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return orjson.loads(response.content)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error fetching page {page}: {e}")
         return None
     finally:
-        time.sleep(random.uniform(*delay_range))
+        elapsed = time.perf_counter() - started
+        time.sleep(max(0, random.uniform(*delay_range) - elapsed))
+
+
+def _has_empty_struct(type_):
+    """True if type_ holds a struct with no fields ({}), at any depth"""
+    if pa.types.is_struct(type_):
+        return type_.num_fields == 0 or any(_has_empty_struct(field.type) for field in type_)
+    if pa.types.is_list(type_) or pa.types.is_large_list(type_):
+        return _has_empty_struct(type_.value_type)
+    return False
+
+
+def _page_table(items):
+    """Build an Arrow table from one page of items, one column per key"""
+    keys = list(dict.fromkeys(key for item in items for key in item))
+    columns = []
+    for key in keys:
+        values = [item.get(key) for item in items]
+        try:
+            column = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            # Mixed types, or ints beyond int64
+            column = None
 
+        # Keep as text (dicts/lists as JSON) what Arrow can't hold: the cases above,
+        # empty objects (Parquet can't store a struct with no fields), nested values in CSV
+        if (column is None or _has_empty_struct(column.type)
+                or (OUTPUT_FORMAT == "csv" and pa.types.is_nested(column.type))):
+            column = pa.array([_to_json_text(v) for v in values], pa.string())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=keys)
 
-def fetch_all_data(base_url, delay_range=(0.2, 0.5)):
+
+def _unify_schema(schemas):
     """
-    Example: Fetch all pages
-    Replace with your actual pagination logic
+    Merge page schemas: new keys are added, types are promoted (null → any,
+    int → float, struct fields merged), and keys whose types can't be merged
+    become text
+    """
+    names = list(dict.fromkeys(name for schema in schemas for name in schema.names))
+    fields = []
+    for name in names:
+        page_fields = [pa.schema([schema.field(name)]) for schema in schemas if name in schema.names]
+        try:
+            fields.append(pa.unify_schemas(page_fields, promote_options="permissive").field(name))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _conform(array, target):
+    """Convert array to target type; raises ArrowInvalid rather than lose data"""
+    if array.type.equals(target):
+        return array
+    if pa.types.is_null(array.type):
+        return pa.nulls(len(array), target)
+    if pa.types.is_string(target):
+        # Key with conflicting types across pages
+        return pa.array([_to_json_text(v) for v in array.to_pylist()], pa.string())
+    if pa.types.is_struct(target):
+        children = [
+            _conform(array.field(field.name), field.type)
+            if array.type.get_field_index(field.name) != -1
+            else pa.nulls(len(array), field.type)
+            for field in target
+        ]
+        return pa.StructArray.from_arrays(children, fields=list(target), mask=array.is_null())
+    if pa.types.is_list(target):
+        values = _conform(array.values, target.value_type)
+        return pa.ListArray.from_arrays(array.offsets, values, mask=array.is_null())
+    # Safe cast: e.g. an int too large for a float column raises
+    return array.cast(target)
+
+
+def _conform_table(table, schema):
+    """Give a page table the unified schema (missing keys as nulls)"""
+    columns = [
+        _conform(table.column(field.name).combine_chunks(), field.type)
+        if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+@contextmanager
+def _open_writer(path, schema):
+    """Open an incremental writer for OUTPUT_FORMAT, yields write(table)"""
+    if OUTPUT_FORMAT == "parquet":
+        with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+            yield writer.write_table
+        return
+
+    with open(path, "wb") as f:
+        f.write(_csv_header(schema.names))
+        yield lambda table: f.write(_csv_rows(_csv_table(table)))
+
+
+def _iter_pages(base_url, delay_range=(0.2, 0.5), max_workers=5):
     """
-    all_items = []
-    page = 1
+    Yield page payloads in page order, stopping at the first empty/failed page
 
-    while True:
+    Page 1 is fetched first to learn total_pages, the rest in waves of
+    max_workers concurrent requests. Requests within a wave are started a
+    random delay apart rather than all at once, and each is still followed
+    by the random delay. A wave is only submitted once the previous one is
+    done, so an empty page stops the scrape within one wave.
+    """
+    print("Fetching page 1...")
+    data = fetch_page(base_url, page=1, delay_range=delay_range)
+
+    if not data or not data.get("items"):
+        return
+    yield data
+
+    total_pages = data.get("total_pages", 1)
+
+    def fetch(page):
         print(f"Fetching page {page}...")
-        data = fetch_page(base_url, page=page, delay_range=delay_range)
+        return fetch_page(base_url, page=page, delay_range=delay_range)
 
-        if not data or not data.get("items"):
-            break
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for start in range(2, total_pages + 1, max_workers):
+            futures = []
+            for page in range(start, min(start + max_workers, total_pages + 1)):
+                if futures:
+                    time.sleep(random.uniform(*delay_range))
+                futures.append(pool.submit(fetch, page))
+            # Results are read in submission order, so pages stay ordered
+            for future in futures:
+                data = future.result()
+                if not data or not data.get("items"):
+                    return
+                yield data
 
-        all_items.extend(data["items"])
 
-        if page >= data.get("total_pages", 1):
-            break
+def fetch_all_data(base_url, delay_range=(0.2, 0.5), max_workers=5):
+    """
+    Example: Fetch all pages and write them to /tmp/data.{OUTPUT_FORMAT}
+    Replace with your actual pagination logic
 
-        page += 1
+    Pages are fetched concurrently (see _iter_pages) and kept as Arrow
+    tables, which are columnar and much smaller than the decoded JSON.
+    Memory still grows with the total data: every page is held until the
+    last one arrives, and on Cloud Run /tmp is RAM too. Once all pages
+    are in, their schemas are merged (keys first seen on later pages are
+    kept, ints promoted to floats, struct fields merged; keys with
+    conflicting types become text) and the pages are written out.
 
-    return pd.DataFrame(all_items)
+    Returns:
+        (path, rows): file to pass to save_to_gcs(), number of rows written
+    """
+    tables = [_page_table(data["items"]) for data in _iter_pages(base_url, delay_range, max_workers)]
+    if not tables:
+        return None, 0
+
+    schema = _unify_schema([table.schema for table in tables])
+
+    # A promotion that would lose data (e.g. an int beyond float precision)
+    # turns that key into text instead; check before anything is written
+    for table in tables:
+        for i, field in enumerate(schema):
+            if field.name not in table.column_names or table.schema.field(field.name).type.equals(field.type):
+                continue
+            try:
+                _conform(table.column(field.name).combine_chunks(), field.type)
+            except pa.ArrowInvalid:
+                schema = schema.set(i, pa.field(field.name, pa.string()))
+
+    path = f"/tmp/data.{OUTPUT_FORMAT}"
+    rows = 0
+    try:
+        with _open_writer(path, schema) as write:
+            for table in tables:
+                write(_conform_table(table, schema))
+                rows += table.num_rows
+    except BaseException:
+        # Don't leave a truncated file behind
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    return path, rows
 
 
 # =============================================================================
@@ -95,11 +417,18 @@ def run_scraper(delay_range=(0.2, 0.5)):
     """Main scraper logic - returns dict with status code and message"""
 
     try:
+        # Checked here rather than at import so a bad value still sends a Slack alert
+        if OUTPUT_FORMAT not in ("csv", "parquet"):
+            raise ValueError(f"OUTPUT_FORMAT must be 'csv' or 'parquet', got {OUTPUT_FORMAT!r}")
+
         # === REPLACE THIS WITH YOUR SCRAPING LOGIC ===
-        # Example: df = fetch_all_data("https://api.example.com/items", delay_range)
+        # Example (streams pages to a local file, then upload it):
+        #   path, rows = fetch_all_data("https://api.example.com/items", delay_range)
+        #   gcs_path = save_to_gcs(path, extension=OUTPUT_FORMAT)  # from dlg import save_to_gcs
 
         # Placeholder - remove and add your logic
         print("TODO: Add your scraping logic here")
+        import pandas as pd  # imported lazily: slow, and not needed on early exits
         df = pd.DataFrame({"example": ["replace", "with", "real", "data"]})
         # === END REPLACE ===
 
@@ -108,10 +437,12 @@ def run_scraper(delay_range=(0.2, 0.5)):
             print(f"Response: {result}")
             return result
 
-        # Save to /tmp then upload to GCS
-        local_file = "/tmp/data.csv"
-        df.to_csv(local_file, index=False)
-        gcs_path = save_to_gcs(local_file)
+        # Upload straight from memory (no /tmp round-trip)
+        if OUTPUT_FORMAT == "parquet":
+            data = to_parquet_bytes(df)
+        else:
+            data = to_csv_bytes(df)
+        gcs_path = save_bytes_to_gcs(data, extension=OUTPUT_FORMAT)
 
         result = {
             "status": 200,
@@ -154,6 +485,11 @@ def run_scraper(delay_range=(0.2, 0.5)):
         notify_error("Internal Server Error", str(e), 500)
         return result
 
+    finally:
+        SESSION.close()
+
 
 if __name__ == "__main__":
-    run_scraper(delay_range=(0.2, 0.5))
+    # Alerts raised during the run go out as one Slack message at the end
+    with batched_slack():
+        run_scraper(delay_range=(0.2, 0.5))